@@ -3,64 +3,175 @@ import json
 import io
 import os
 import math
-import matplotlib.pyplot as plt
-import geopandas as gpd
-from shapely.geometry import Point
-import contextily as cx
+import functools
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from docxtpl import DocxTemplate, InlineImage
 from docx.shared import Cm
-from staticmap import StaticMap, CircleMarker
 
-def get_map_png_bytes(lon, lat, buffer_m=300, width_px=900, height_px=700, zoom=17):
+# Teselas satelitales de Esri World Imagery
+ESRI_WORLD_IMAGERY_URL = "https://server.arcgisonline.com/ArcGIS/rest/services/World_Imagery/MapServer/tile/{z}/{y}/{x}"
+
+
+def get_map_png_bytes(lon, lat, width_px=900, height_px=700, zoom=18, url_template=ESRI_WORLD_IMAGERY_URL):
     """
-    Genera un PNG (bytes) de un mapa satelital con marcador en (lon, lat).
-    - buffer_m: radio en metros alrededor del punto (controla "zoom").
-    - zoom: nivel de teselas (18-19 suele ser bueno).
+    Genera un PNG (bytes) de un mapa con marcador en (lon, lat); por defecto, satelital.
+    - width_px, height_px: tamaño de la imagen en píxeles.
+    - zoom: nivel de teselas (18-19 suele ser bueno); None lo ajusta automáticamente.
+    - url_template: plantilla de teselas; None usa el mapa de calles por defecto de staticmap.
     """
-    # Crear punto y reproyectar a Web Mercator
-    gdf = gpd.GeoDataFrame(geometry=[Point(lon, lat)], crs="EPSG:4326").to_crs(epsg=3857)
-    pt = gdf.geometry.iloc[0]
-    
-    # Calcular bounding box
-    bbox = (pt.x - buffer_m, pt.y - buffer_m, pt.x + buffer_m, pt.y + buffer_m)
+    # Importación diferida: solo se carga al generar el mapa en el paso 5
+    from staticmap import StaticMap, CircleMarker
 
-    # Crear figura
-    fig, ax = plt.subplots(figsize=(width_px/100, height_px/100), dpi=100)
-    ax.set_xlim(bbox[0], bbox[2])
-    ax.set_ylim(bbox[1], bbox[3])
+    if url_template:
+        mapa = StaticMap(width_px, height_px, url_template=url_template)
+    else:
+        mapa = StaticMap(width_px, height_px)
+    mapa.add_marker(CircleMarker((lon, lat), 'red', 12))
+    img_map = mapa.render(zoom=zoom)
 
-    # Añadir basemap (Esri World Imagery)
-    cx.add_basemap(ax, source=cx.providers.Esri.WorldImagery, crs="EPSG:3857", zoom=zoom)
+    # Guardar a buffer en memoria
+    buf = io.BytesIO()
+    img_map.save(buf, format='PNG')
+    return buf.getvalue()
 
-    # Dibujar marcador
-    gdf.plot(ax=ax, markersize=40, color="red")
 
-    ax.set_axis_off()
-    plt.tight_layout(pad=0)
+@st.cache_data(ttl=86400, max_entries=128, show_spinner=False)
+def obtener_mapa_png(tipo_coordenada: str, lat: float, lon: float) -> bytes:
+    """
+    Devuelve el PNG (bytes) del mapa del proyecto según el tipo de coordenada.
+    - Urbano: mapa de calles de 600x400 con zoom automático.
+    - Rural: mapa satelital.
+    Se cachea por (tipo, lat, lon): un rerun con las mismas coordenadas no descarga teselas.
+    """
+    if tipo_coordenada == "Urbano":
+        return get_map_png_bytes(lon, lat, width_px=600, height_px=400, zoom=None, url_template=None)
+
+    return get_map_png_bytes(lon, lat)
+
+
+@st.cache_data(show_spinner=False)
+def leer_plantilla(template_path: str) -> bytes:
+    """Lee una sola vez los bytes de la plantilla Word; se comparten entre reruns y usuarios."""
+    with open(template_path, 'rb') as f:
+        return f.read()
+
+
+def cargar_plantilla(template_path: str) -> DocxTemplate:
+    """
+    Crea un DocxTemplate nuevo sobre una copia en memoria de la plantilla.
+    Se construye uno cada vez que se confirma el paso 2, en lugar de compartir uno
+    cacheado entre sesiones, porque render() modifica la plantilla.
+    """
+    return DocxTemplate(io.BytesIO(leer_plantilla(template_path)))
+
+
+def reducir_imagen(archivo, ancho_max=1800) -> bytes:
+    """
+    Reduce y comprime una imagen subida antes de insertarla en el Word.
+    A 14 cm de ancho no se aprovechan más de ~1800 px, así que las fotos del celular
+    se redimensionan y se guardan como JPEG.
+    """
+    # Importación diferida: solo se usa al procesar imágenes en el paso 5
+    from PIL import Image, ImageOps
+
+    img = ImageOps.exif_transpose(Image.open(archivo))
+    img.load()
+    archivo.seek(0)  # el archivo subido queda listo para releerse en otro rerun
+    img.thumbnail((ancho_max, ancho_max * 2), Image.Resampling.LANCZOS)
+
+    # JPEG no admite transparencia: se aplana sobre fondo blanco
+    if img.mode in ("RGBA", "LA", "P"):
+        img = img.convert("RGBA")
+        fondo = Image.new("RGB", img.size, "white")
+        fondo.paste(img, mask=img.getchannel("A"))
+        img = fondo
+    else:
+        img = img.convert("RGB")
 
-    # Guardar a buffer en memoria
     buf = io.BytesIO()
-    plt.savefig(buf, format="png", bbox_inches="tight", pad_inches=0)
-    plt.close(fig)
-    buf.seek(0)
+    img.save(buf, format="JPEG", quality=82, optimize=True, progressive=True)
     return buf.getvalue()
 
 
+def reducir_imagenes(archivos, cache: dict) -> list:
+    """
+    Aplica reducir_imagen a varias imágenes subidas en paralelo (None donde no se subió ninguna
+    o no se pudo leer).
+    Pillow libera el GIL al decodificar y codificar, así que los hilos se solapan.
+    - cache: bytes ya reducidos por file_id del archivo subido; un rerun sin cambios en los
+      cargadores no vuelve a procesar nada y se descartan los de archivos retirados.
+    Los errores de cada imagen se muestran en la página en lugar de propagarse.
+    """
+    pendientes = [archivo for archivo in archivos if archivo and archivo.file_id not in cache]
+    if pendientes:
+        with ThreadPoolExecutor(max_workers=4) as ejecutor:
+            futuros = [(archivo, ejecutor.submit(reducir_imagen, archivo)) for archivo in pendientes]
+            for archivo, futuro in futuros:
+                try:
+                    cache[archivo.file_id] = futuro.result()
+                except Exception as e:
+                    st.error(f"No se pudo procesar la imagen {archivo.name}. {e}")
+
+    vigentes = {archivo.file_id for archivo in archivos if archivo}
+    for file_id in list(cache):
+        if file_id not in vigentes:
+            del cache[file_id]
+
+    return [io.BytesIO(cache[archivo.file_id]) if archivo and archivo.file_id in cache else None for archivo in archivos]
+
+
+def crear_imagen_word(doc, imagen, ancho_cm=14):
+    """Devuelve la imagen como InlineImage del documento, o None si no se subió."""
+    return InlineImage(doc, imagen, Cm(ancho_cm)) if imagen else None
+
+
+def guardar_fecha(data: dict, clave: str, fecha) -> None:
+    """
+    Guarda la fecha en data[clave + 'SinFormato'] y su texto YYYY-MM-DD en data[clave].
+    El texto solo se recalcula cuando la fecha cambia.
+    """
+    clave_sin_formato = f'{clave}SinFormato'
+    if clave not in data or data.get(clave_sin_formato) != fecha:
+        data[clave_sin_formato] = fecha
+        data[clave] = fecha.isoformat()
+
 
 def convertir_a_mayusculas(data):
-    if isinstance(data, str):
-        return data.upper()
+    if not isinstance(data, (dict, list, tuple)):
+        return data.upper() if isinstance(data, str) else data  # cualquier otro tipo se deja igual
     elif isinstance(data, dict):
         return {k: convertir_a_mayusculas(v) for k, v in data.items()}
     elif isinstance(data, list):
         return [convertir_a_mayusculas(v) for v in data]
-    elif isinstance(data, tuple):
-        return tuple(convertir_a_mayusculas(v) for v in data)
     else:
-        return data  # cualquier otro tipo se deja igual
+        return tuple(convertir_a_mayusculas(v) for v in data)
+
+
+# Listado de temperaturas desde -10 hasta 110 con paso de 5
+TEMPERATURA_MINIMA = -10
+PASO_TEMPERATURA = 5
+
+# Valores por tipo de aislamiento (uno por cada temperatura del listado)
+VALORES_ACEITE = (
+    0.125, 0.180, 0.25, 0.36, 0.50, 0.75, 1.00, 1.40, 1.98, 2.80, 
+    3.95, 5.60, 7.85, 11.20, 15.85, 22.40, 31.75, 44.70, 63.50, 
+    89.789, 127.00, 180.00, 254.00, 359.15, 509.00
+)
 
+VALORES_SECO = (
+    0.25, 0.32, 0.40, 0.50, 0.63, 0.81, 1.00, 1.25, 1.58, 2.00, 
+    2.50, 3.15, 3.98, 5.00, 6.30, 7.90, 10.00, 12.60, 15.80, 
+    20.00, 25.20, 31.60, 40.00, 50.40, 63.20
+)
 
+VALORES_POR_AISLAMIENTO = {
+    "aceite": VALORES_ACEITE,
+    "seco": VALORES_SECO,
+}
+
+
+@functools.lru_cache(maxsize=256)
 def obtener_valor_por_temperatura(temperatura_prueba: float, tipo_aislamiento: str) -> float:
     """Obtiene el valor de resistencia de aislamiento basado en la temperatura de prueba y tipo de aislamiento.
 
@@ -72,42 +183,102 @@ def obtener_valor_por_temperatura(temperatura_prueba: float, tipo_aislamiento: s
         tipo_aislamiento (str): Tipo de aislamiento del transformador, puede ser "Aceite" o "Seco".
 
     Raises:
-        ValueError: Si el tipo de aislamiento no es válido.
+        ValueError: Si el tipo de aislamiento no es válido o la temperatura no es un número finito.
 
     Returns:
         float: Valor de resistencia de aislamiento correspondiente a la temperatura más cercana.
     """
     
-    # Listado de temperaturas desde -10 hasta 110 con paso de 5
-    temperaturas = list(range(-10, 115, 5))
-    
-    # Valores por tipo de aislamiento
-    valores_aceite = [
-        0.125, 0.180, 0.25, 0.36, 0.50, 0.75, 1.00, 1.40, 1.98, 2.80, 
-        3.95, 5.60, 7.85, 11.20, 15.85, 22.40, 31.75, 44.70, 63.50, 
-        89.789, 127.00, 180.00, 254.00, 359.15, 509.00
-    ]
-    
-    valores_seco = [
-        0.25, 0.32, 0.40, 0.50, 0.63, 0.81, 1.00, 1.25, 1.58, 2.00, 
-        2.50, 3.15, 3.98, 5.00, 6.30, 7.90, 10.00, 12.60, 15.80, 
-        20.00, 25.20, 31.60, 40.00, 50.40, 63.20
-    ]
-    
     # Seleccionar lista de valores según tipo de aislamiento
-    if tipo_aislamiento.lower() == "aceite":
-        valores = valores_aceite
-    elif tipo_aislamiento.lower() == "seco":
-        valores = valores_seco
-    else:
+    valores = VALORES_POR_AISLAMIENTO.get(tipo_aislamiento.casefold())
+    if valores is None:
         raise ValueError("Tipo de aislamiento no válido. Use 'Aceite' o 'Seco'.")
     
-    # Encontrar índice de la temperatura más cercana
-    indice_cercano = min(range(len(temperaturas)), key=lambda i: abs(temperaturas[i] - temperatura_prueba))
+    if not math.isfinite(temperatura_prueba):
+        raise ValueError("Temperatura de prueba no válida. Ingrese un número finito en °C.")
+    
+    # Índice de la temperatura más cercana (los empates van a la temperatura menor)
+    indice_cercano = math.ceil((temperatura_prueba - TEMPERATURA_MINIMA) / PASO_TEMPERATURA - 0.5)
+    indice_cercano = max(0, min(len(valores) - 1, indice_cercano))
     
     return valores[indice_cercano]
 
 
+PRUEBAS_RESISTENCIA = ("AVST", "AVSB", "BVST")
+
+# Resistencias especificadas [GΩ] por tipo de aislamiento, en el orden de PRUEBAS_RESISTENCIA
+RESISTENCIAS_ESPECIFICADAS = {
+    "Aceite": (5, 5, 1),
+    "Seco": (25, 25, 5),
+}
+
+
+def evaluar_resistencias(data: dict, factor_temperatura: float, pruebas=PRUEBAS_RESISTENCIA) -> None:
+    """Calcula la resistencia referida, la especificada y el resultado de cada prueba.
+
+    Los valores se escriben directamente en `data` con las claves resReferida_*, resEsp_* y resultado_*.
+
+    Args:
+        data (dict): Datos del formulario con las resistencias medidas (resMedida_*) y el tipo de aislamiento.
+        factor_temperatura (float): Factor de corrección obtenido con obtener_valor_por_temperatura.
+        pruebas (tuple): Pruebas medidas; a las demás solo se les asigna la resistencia especificada.
+    """
+    
+    for prueba, res_esp in zip(PRUEBAS_RESISTENCIA, RESISTENCIAS_ESPECIFICADAS[data['tipoAislamiento']]):
+        data[f'resEsp_{prueba}'] = res_esp
+        if prueba in pruebas:
+            res_referida = data[f'resMedida_{prueba}'] * factor_temperatura
+            data[f'resReferida_{prueba}'] = res_referida
+            data[f'resultado_{prueba}'] = 'Cumple' if res_referida >= res_esp else 'No Cumple'
+
+
+# Imágenes de pruebas del paso 5: (clave en la plantilla, etiqueta del cargador)
+IMAGENES_PRUEBAS = (
+    ("imgFichaTecnicaTrafo", "Imagen de Ficha Técnica del Trafo"),
+    ("imgPruebaMon1", "Imagen de Prueba #1 (Alta VS Tierra) del Trafo"),
+    ("imgPruebaMon2", "Imagen de Prueba #2 (Alta VS Baja) del Trafo"),
+    ("imgPruebaMon3", "Imagen de Prueba #3 (Baja VS Tierra) del Trafo"),
+)
+
+# Monofásico en pedestal: no se mide Alta VS. Tierra
+IMAGENES_PRUEBAS_MONOFASICO_PEDESTAL = (
+    ("imgFichaTecnicaTrafo", "Imagen de Ficha Técnica del Trafo"),
+    ("imgPruebaMon1", "Imagen de Prueba #1 (Alta VS Baja) del Trafo"),
+    ("imgPruebaMon2", "Imagen de Prueba #2 (Baja VS Tierra) del Trafo"),
+)
+
+
+def obtener_imagenes_pruebas(data: dict) -> tuple:
+    """Devuelve las imágenes de pruebas que se piden según el número de fases y la ubicación del transformador."""
+    if data['carTrafo_NroFases'] != 3 and data['ubicacionTransformador'] == "Pedestal":
+        return IMAGENES_PRUEBAS_MONOFASICO_PEDESTAL
+    return IMAGENES_PRUEBAS
+
+
+def agregar_mapa_proyecto(data: dict, datos: dict, doc) -> None:
+    """
+    Genera el mapa de las coordenadas del proyecto y lo guarda en datos['imgMapsProyecto'].
+    Los errores se muestran en la página en lugar de propagarse.
+    """
+    if not (data['latitud'] and data['longitud']):
+        st.error("Faltan coordenadas para el mapa.")
+        return
+    
+    try:
+        lat = float(str(data['latitud']).replace(',', '.'))
+        lon = float(str(data['longitud']).replace(',', '.'))
+        
+        if data['tipoCoordenada'] != "Urbano":
+            st.warning(f"Prueba de coordenada en modo rural (latitud): {lat}")
+            st.warning(f"Prueba de coordenada en modo rural (longitud): {lon}")
+        
+        # Las coordenadas se redondean a 6 decimales para reutilizar la caché
+        png_mapa = obtener_mapa_png(data['tipoCoordenada'], round(lat, 6), round(lon, 6))
+        datos['imgMapsProyecto'] = InlineImage(doc, io.BytesIO(png_mapa), Cm(18))
+    except Exception as e:
+        st.error(f"Coordenadas inválidas para el mapa. {e}")
+
+
 # Inicialización de estado
 if 'step' not in st.session_state:
     st.session_state.step = 1
@@ -133,41 +304,46 @@ def prev_step():
 if st.session_state.step == 1:
     st.header("Paso 1: Información General")
     
-    st.session_state.data['nombreProyecto'] = st.text_input("Nombre del Proyecto", key='nombreProyecto')
-    st.session_state.data['nombreCiudadoMunicipio'] = st.text_input("Ciudad o Municipio", key='ciudad')
-    st.session_state.data['nombreDepartamento'] = st.text_input("Departamento", key='departamento')
-    st.session_state.data['tipoCoordenada'] = st.selectbox(f"Tipo de Imagen para las Coordenadas", ["Urbano", "Rural"], key=f'tipo_coordenada')
-    st.session_state.data['nombreCompleto'] = st.text_input("Nombre Completo", key='nombre')
-    st.session_state.data['nroConteoTarjeta'] = st.text_input("Número de CONTE o Tarjeta Profesional", key='conte_tarjeta')
-    st.session_state.data['nombreCargo'] = st.text_input("Nombre del Cargo", key='cargo')
-    st.session_state.data['fechaCreacionSinFormato'] = st.date_input("Fecha de Creación", key='fecha_creacion', value=datetime.now())
-    st.session_state.data['fechaCreacion'] = st.session_state.data['fechaCreacionSinFormato'].strftime("%Y-%m-%d")
-    st.session_state.data['direccion'] = st.text_input("Dirección", key='direccion')
-
-    cols = st.columns([1,1])
-    if cols[1].button("Siguiente"):
+    with st.form("paso1", enter_to_submit=False):
+        st.session_state.data['nombreProyecto'] = st.text_input("Nombre del Proyecto", key='nombreProyecto')
+        st.session_state.data['nombreCiudadoMunicipio'] = st.text_input("Ciudad o Municipio", key='ciudad')
+        st.session_state.data['nombreDepartamento'] = st.text_input("Departamento", key='departamento')
+        st.session_state.data['tipoCoordenada'] = st.selectbox(f"Tipo de Imagen para las Coordenadas", ["Urbano", "Rural"], key=f'tipo_coordenada')
+        st.session_state.data['nombreCompleto'] = st.text_input("Nombre Completo", key='nombre')
+        st.session_state.data['nroConteoTarjeta'] = st.text_input("Número de CONTE o Tarjeta Profesional", key='conte_tarjeta')
+        st.session_state.data['nombreCargo'] = st.text_input("Nombre del Cargo", key='cargo')
+        guardar_fecha(st.session_state.data, 'fechaCreacion', st.date_input("Fecha de Creación", key='fecha_creacion', value=datetime.now()))
+        st.session_state.data['direccion'] = st.text_input("Dirección", key='direccion')
+
+        cols = st.columns([1,1])
+        siguiente = cols[1].form_submit_button("Siguiente")
+
+    if siguiente:
         next_step()
 
 # Paso 2: Datos Técnicos
 elif st.session_state.step == 2:
     st.header("Paso 2: Datos Técnicos")
     
-    st.session_state.data['nroTransformador'] = st.text_input("Número del Transformador", key='nro_transformador')
-    st.session_state.data['capacidadTransformador'] = st.text_input("Capacidad del Transformador [kVA]", key='capacidad_transformador')
-    st.session_state.data['tipoTransformador'] = st.selectbox("Tipo de Transformador", ["Trifásico", "Monofásico"], key='tipotrafo')
-    st.session_state.data['ubicacionTransformador'] = st.selectbox("Ubicación del Transformador", ["Pedestal", "Poste"], key='ubicaciontrafo')
-    st.session_state.data['tipoAislamiento'] = st.selectbox("Tipo de Aislamiento", ["Aceite", "Seco"], key='tipoaislamiento')
-    st.session_state.data['voltajePrimario'] = st.text_input("Voltaje Primario [V]", key='voltprimario')
-    st.session_state.data['voltajeSecundario'] = st.text_input("Voltaje Secundario [V]", key='voltsecundario')
-    st.session_state.data['latitud'] = st.text_input("Latitud", key='latitud')
-    st.session_state.data['longitud'] = st.text_input("Longitud", key='longitud')
-    st.session_state.data['fechaCalibracionSinFormato'] = st.date_input("Fecha de Calibración", key='fecha_calibracion')
-    st.session_state.data['fechaCalibracion'] = st.session_state.data['fechaCalibracionSinFormato'].strftime("%Y-%m-%d")
-
-    cols = st.columns([1,1,1])
-    if cols[0].button("Anterior"):
+    with st.form("paso2", enter_to_submit=False):
+        st.session_state.data['nroTransformador'] = st.text_input("Número del Transformador", key='nro_transformador')
+        st.session_state.data['capacidadTransformador'] = st.text_input("Capacidad del Transformador [kVA]", key='capacidad_transformador')
+        st.session_state.data['tipoTransformador'] = st.selectbox("Tipo de Transformador", ["Trifásico", "Monofásico"], key='tipotrafo')
+        st.session_state.data['ubicacionTransformador'] = st.selectbox("Ubicación del Transformador", ["Pedestal", "Poste"], key='ubicaciontrafo')
+        st.session_state.data['tipoAislamiento'] = st.selectbox("Tipo de Aislamiento", ["Aceite", "Seco"], key='tipoaislamiento')
+        st.session_state.data['voltajePrimario'] = st.text_input("Voltaje Primario [V]", key='voltprimario')
+        st.session_state.data['voltajeSecundario'] = st.text_input("Voltaje Secundario [V]", key='voltsecundario')
+        st.session_state.data['latitud'] = st.text_input("Latitud", key='latitud')
+        st.session_state.data['longitud'] = st.text_input("Longitud", key='longitud')
+        guardar_fecha(st.session_state.data, 'fechaCalibracion', st.date_input("Fecha de Calibración", key='fecha_calibracion'))
+
+        cols = st.columns([1,1,1])
+        anterior = cols[0].form_submit_button("Anterior")
+        siguiente = cols[1].form_submit_button("Siguiente")
+
+    if anterior:
         prev_step()
-    if cols[1].button("Siguiente"):
+    if siguiente:
         
         if st.session_state.data['tipoTransformador'] == "Trifásico" and st.session_state.data['ubicacionTransformador'] == "Pedestal":
         
@@ -187,7 +363,7 @@ elif st.session_state.step == 2:
         
         # Cargar la plantilla en el estado de sesión
         try:
-            st.session_state.doc = DocxTemplate(template_path)
+            st.session_state.doc = cargar_plantilla(template_path)
             next_step()
         except FileNotFoundError:
             st.error(f"No se encontró la plantilla: {template_path}")
@@ -196,477 +372,126 @@ elif st.session_state.step == 2:
 elif st.session_state.step == 3:
     st.header("Paso 3: Formulario de Desarrollo y Resultados de la Prueba")
         
-    st.session_state.data['carTrafo_Marca'] = st.text_input("Marca del Transformador", key='cartrafomarca')
-    st.session_state.data['carTrafo_Serie'] = st.text_input("Serie del Transformador", key='cartrafoserie')
-    st.session_state.data['carTrafo_Tipo'] = st.text_input("Tipo del Transformador", key='cartrafotipo')
-    st.session_state.data['carTrafo_FechaFabricacionSinFormato'] = st.date_input("Fecha de Fabricación del Transformador", key='cartrafofechafabrisf')
-    st.session_state.data['carTrafo_FechaFabricacion'] = st.session_state.data['carTrafo_FechaFabricacionSinFormato'].strftime("%Y-%m-%d")
-    st.session_state.data['carTrafo_Frecuencia'] = st.text_input("Frecuencia del Transformador [Hz]", key='cartrafofrec')
-    st.session_state.data['carTrafo_NroFases'] = 3 if st.session_state.data['tipoTransformador'] == "Trifásico" else 1
-    st.session_state.data['carTrafo_Conexion'] = st.text_input("Conexión del Transformador", key='cartrafoconexion')
-    st.session_state.data['carTrafo_MedioAislamiento'] = st.text_input("Medio de Aislamiento del Transformador", key='cartrafomedioaisl')
-    st.session_state.data['carTrafo_FechaMediciones'] = st.session_state.data['fechaCreacion']
-    st.session_state.data['temperaturaPrueba'] = st.text_input("Temperatura de la Prueba [°C]", key='temperaturaprueba')
-
-    cols = st.columns([1,1,1])
-    if cols[0].button("Anterior"):
+    with st.form("paso3", enter_to_submit=False):
+        st.session_state.data['carTrafo_Marca'] = st.text_input("Marca del Transformador", key='cartrafomarca')
+        st.session_state.data['carTrafo_Serie'] = st.text_input("Serie del Transformador", key='cartrafoserie')
+        st.session_state.data['carTrafo_Tipo'] = st.text_input("Tipo del Transformador", key='cartrafotipo')
+        guardar_fecha(st.session_state.data, 'carTrafo_FechaFabricacion', st.date_input("Fecha de Fabricación del Transformador", key='cartrafofechafabrisf'))
+        st.session_state.data['carTrafo_Frecuencia'] = st.text_input("Frecuencia del Transformador [Hz]", key='cartrafofrec')
+        st.session_state.data['carTrafo_NroFases'] = 3 if st.session_state.data['tipoTransformador'] == "Trifásico" else 1
+        st.session_state.data['carTrafo_Conexion'] = st.text_input("Conexión del Transformador", key='cartrafoconexion')
+        st.session_state.data['carTrafo_MedioAislamiento'] = st.text_input("Medio de Aislamiento del Transformador", key='cartrafomedioaisl')
+        st.session_state.data['carTrafo_FechaMediciones'] = st.session_state.data['fechaCreacion']
+        st.session_state.data['temperaturaPrueba'] = st.text_input("Temperatura de la Prueba [°C]", key='temperaturaprueba')
+
+        cols = st.columns([1,1,1])
+        anterior = cols[0].form_submit_button("Anterior")
+        siguiente = cols[1].form_submit_button("Siguiente")
+
+    if anterior:
         prev_step()
-    if cols[1].button("Siguiente"):
+    if siguiente:
         next_step()
 
 # Paso 4: Detalles por Tramo
 elif st.session_state.step == 4:
     st.header("Paso 4: Detalles de la tabla de Resistencia de Aislamiento")
     
-    if st.session_state.data['carTrafo_NroFases'] == 3:
+    # Factor de corrección por temperatura, común a todas las mediciones
+    factor_temperatura = obtener_valor_por_temperatura(temperatura_prueba=float(st.session_state.data.get('temperaturaPrueba', 0)), tipo_aislamiento=st.session_state.data.get('tipoAislamiento', 'NA'))
+    
+    with st.form("paso4", enter_to_submit=False):
+        if st.session_state.data['carTrafo_NroFases'] == 3:
         
-        if st.session_state.data['ubicacionTransformador'] == "Pedestal":
+            if st.session_state.data['ubicacionTransformador'] == "Pedestal":
     
-            st.session_state.data['resMedida_AVST'] = st.number_input("Resistencia Medida - Alta VS. Tierra [GΩ]", key='res_medida_avst', min_value=0.0, format="%.2f")
-            st.session_state.data['resReferida_AVST'] = st.session_state.data['resMedida_AVST']  * obtener_valor_por_temperatura(temperatura_prueba=float(st.session_state.data.get('temperaturaPrueba', 0)), tipo_aislamiento=st.session_state.data.get('tipoAislamiento', 'NA'))
-            st.session_state.data['resMedida_AVSB'] = st.number_input("Resistencia Medida - Alta VS. Baja [GΩ]", key='res_medida_avsb', min_value=0.0, format="%.2f")
-            st.session_state.data['resReferida_AVSB'] = st.session_state.data['resMedida_AVSB']  * obtener_valor_por_temperatura(temperatura_prueba=float(st.session_state.data.get('temperaturaPrueba', 0)), tipo_aislamiento=st.session_state.data.get('tipoAislamiento', 'NA'))
-            st.session_state.data['resMedida_BVST'] = st.number_input("Resistencia Medida - Baja VS. Tierra [GΩ]", key='res_medida_bvst', min_value=0.0, format="%.2f")
-            st.session_state.data['resReferida_BVST'] = st.session_state.data['resMedida_BVST']  * obtener_valor_por_temperatura(temperatura_prueba=float(st.session_state.data.get('temperaturaPrueba', 0)), tipo_aislamiento=st.session_state.data.get('tipoAislamiento', 'NA'))
-            
-            st.session_state.data['resEsp_AVST'] = 5 if st.session_state.data['tipoAislamiento'] == "Aceite" else 25
-            st.session_state.data['resEsp_AVSB'] = 5 if st.session_state.data['tipoAislamiento'] == "Aceite" else 25
-            st.session_state.data['resEsp_BVST'] = 1 if st.session_state.data['tipoAislamiento'] == "Aceite" else 5
+                st.session_state.data['resMedida_AVST'] = st.number_input("Resistencia Medida - Alta VS. Tierra [GΩ]", key='res_medida_avst', min_value=0.0, format="%.2f")
+                st.session_state.data['resMedida_AVSB'] = st.number_input("Resistencia Medida - Alta VS. Baja [GΩ]", key='res_medida_avsb', min_value=0.0, format="%.2f")
+                st.session_state.data['resMedida_BVST'] = st.number_input("Resistencia Medida - Baja VS. Tierra [GΩ]", key='res_medida_bvst', min_value=0.0, format="%.2f")
             
-            st.session_state.data['resultado_AVST'] = 'Cumple' if st.session_state.data['resReferida_AVST'] >= st.session_state.data['resEsp_AVST'] else 'No Cumple'
-            st.session_state.data['resultado_AVSB'] = 'Cumple' if st.session_state.data['resReferida_AVSB'] >= st.session_state.data['resEsp_AVSB'] else 'No Cumple'
-            st.session_state.data['resultado_BVST'] = 'Cumple' if st.session_state.data['resReferida_BVST'] >= st.session_state.data['resEsp_BVST'] else 'No Cumple'
+                evaluar_resistencias(st.session_state.data, factor_temperatura)
             
-            st.session_state.data['comentariosPrueba'] = st.text_area("Comentarios de la Prueba", key='comentarios_prueba')
+                st.session_state.data['comentariosPrueba'] = st.text_area("Comentarios de la Prueba", key='comentarios_prueba')
             
-        elif st.session_state.data['ubicacionTransformador'] == "Poste":
+            elif st.session_state.data['ubicacionTransformador'] == "Poste":
             
-            st.session_state.data['resMedida_AVST'] = st.number_input("Resistencia Medida - Alta VS. Tierra [GΩ]", key='res_medida_avst', min_value=0.0, format="%.2f")
-            st.session_state.data['resReferida_AVST'] = st.session_state.data['resMedida_AVST']  * obtener_valor_por_temperatura(temperatura_prueba=float(st.session_state.data.get('temperaturaPrueba', 0)), tipo_aislamiento=st.session_state.data.get('tipoAislamiento', 'NA'))
-            st.session_state.data['resMedida_AVSB'] = st.number_input("Resistencia Medida - Alta VS. Baja [GΩ]", key='res_medida_avsb', min_value=0.0, format="%.2f")
-            st.session_state.data['resReferida_AVSB'] = st.session_state.data['resMedida_AVSB']  * obtener_valor_por_temperatura(temperatura_prueba=float(st.session_state.data.get('temperaturaPrueba', 0)), tipo_aislamiento=st.session_state.data.get('tipoAislamiento', 'NA'))
-            st.session_state.data['resMedida_BVST'] = st.number_input("Resistencia Medida - Baja VS. Tierra [GΩ]", key='res_medida_bvst', min_value=0.0, format="%.2f")
-            st.session_state.data['resReferida_BVST'] = st.session_state.data['resMedida_BVST']  * obtener_valor_por_temperatura(temperatura_prueba=float(st.session_state.data.get('temperaturaPrueba', 0)), tipo_aislamiento=st.session_state.data.get('tipoAislamiento', 'NA'))
+                st.session_state.data['resMedida_AVST'] = st.number_input("Resistencia Medida - Alta VS. Tierra [GΩ]", key='res_medida_avst', min_value=0.0, format="%.2f")
+                st.session_state.data['resMedida_AVSB'] = st.number_input("Resistencia Medida - Alta VS. Baja [GΩ]", key='res_medida_avsb', min_value=0.0, format="%.2f")
+                st.session_state.data['resMedida_BVST'] = st.number_input("Resistencia Medida - Baja VS. Tierra [GΩ]", key='res_medida_bvst', min_value=0.0, format="%.2f")
             
-            st.session_state.data['resEsp_AVST'] = 5 if st.session_state.data['tipoAislamiento'] == "Aceite" else 25
-            st.session_state.data['resEsp_AVSB'] = 5 if st.session_state.data['tipoAislamiento'] == "Aceite" else 25
-            st.session_state.data['resEsp_BVST'] = 1 if st.session_state.data['tipoAislamiento'] == "Aceite" else 5
+                evaluar_resistencias(st.session_state.data, factor_temperatura)
             
-            st.session_state.data['resultado_AVST'] = 'Cumple' if st.session_state.data['resReferida_AVST'] >= st.session_state.data['resEsp_AVST'] else 'No Cumple'
-            st.session_state.data['resultado_AVSB'] = 'Cumple' if st.session_state.data['resReferida_AVSB'] >= st.session_state.data['resEsp_AVSB'] else 'No Cumple'
-            st.session_state.data['resultado_BVST'] = 'Cumple' if st.session_state.data['resReferida_BVST'] >= st.session_state.data['resEsp_BVST'] else 'No Cumple'
+                st.session_state.data['comentariosPrueba'] = st.text_area("Comentarios de la Prueba", key='comentarios_prueba')
             
-            st.session_state.data['comentariosPrueba'] = st.text_area("Comentarios de la Prueba", key='comentarios_prueba')
-            
-        else:
+            else:
             
-            st.error("Ubicación del Transformador no válida.")
+                st.error("Ubicación del Transformador no válida.")
         
-    else:
+        else:
         
-        if st.session_state.data['ubicacionTransformador'] == "Pedestal":
+            if st.session_state.data['ubicacionTransformador'] == "Pedestal":
         
-            st.session_state.data['resMedida_AVST'] = st.text_input("Resistencia Medida - Alta VS. Tierra [GΩ]", key='res_medida_avst', value='-', disabled=True)
-            st.session_state.data['resReferida_AVST'] = '-'
-            st.session_state.data['resMedida_AVSB'] = st.number_input("Resistencia Medida - Alta VS. Baja [GΩ]", key='res_medida_avsb', min_value=0.0, format="%.2f")
-            st.session_state.data['resReferida_AVSB'] = st.session_state.data['resMedida_AVSB']  * obtener_valor_por_temperatura(temperatura_prueba=float(st.session_state.data.get('temperaturaPrueba', 0)), tipo_aislamiento=st.session_state.data.get('tipoAislamiento', 'NA'))
-            st.session_state.data['resMedida_BVST'] = st.number_input("Resistencia Medida - Baja VS. Tierra [GΩ]", key='res_medida_bvst', min_value=0.0, format="%.2f")
-            st.session_state.data['resReferida_BVST'] = st.session_state.data['resMedida_BVST']  * obtener_valor_por_temperatura(temperatura_prueba=float(st.session_state.data.get('temperaturaPrueba', 0)), tipo_aislamiento=st.session_state.data.get('tipoAislamiento', 'NA'))
-            
-            st.session_state.data['resEsp_AVST'] = 5 if st.session_state.data['tipoAislamiento'] == "Aceite" else 25
-            st.session_state.data['resEsp_AVSB'] = 5 if st.session_state.data['tipoAislamiento'] == "Aceite" else 25
-            st.session_state.data['resEsp_BVST'] = 1 if st.session_state.data['tipoAislamiento'] == "Aceite" else 5
-            
-            st.session_state.data['resultado_AVST'] = 'Cumple'
-            st.session_state.data['resultado_AVSB'] = 'Cumple' if st.session_state.data['resReferida_AVSB'] >= st.session_state.data['resEsp_AVSB'] else 'No Cumple'
-            st.session_state.data['resultado_BVST'] = 'Cumple' if st.session_state.data['resReferida_BVST'] >= st.session_state.data['resEsp_BVST'] else 'No Cumple'
+                st.session_state.data['resMedida_AVST'] = st.text_input("Resistencia Medida - Alta VS. Tierra [GΩ]", key='res_medida_avst', value='-', disabled=True)
+                st.session_state.data['resReferida_AVST'] = '-'
+                st.session_state.data['resMedida_AVSB'] = st.number_input("Resistencia Medida - Alta VS. Baja [GΩ]", key='res_medida_avsb', min_value=0.0, format="%.2f")
+                st.session_state.data['resMedida_BVST'] = st.number_input("Resistencia Medida - Baja VS. Tierra [GΩ]", key='res_medida_bvst', min_value=0.0, format="%.2f")
             
-            st.session_state.data['comentariosPrueba'] = st.text_area("Comentarios de la Prueba", key='comentarios_prueba')
+                st.session_state.data['resultado_AVST'] = 'Cumple'
+                evaluar_resistencias(st.session_state.data, factor_temperatura, pruebas=("AVSB", "BVST"))
             
-        elif st.session_state.data['ubicacionTransformador'] == "Poste":
+                st.session_state.data['comentariosPrueba'] = st.text_area("Comentarios de la Prueba", key='comentarios_prueba')
             
-            st.session_state.data['resMedida_AVST'] = st.number_input("Resistencia Medida - Alta VS. Tierra [GΩ]", key='res_medida_avst', min_value=0.0, format="%.2f")
-            st.session_state.data['resReferida_AVST'] = st.session_state.data['resMedida_AVST']  * obtener_valor_por_temperatura(temperatura_prueba=float(st.session_state.data.get('temperaturaPrueba', 0)), tipo_aislamiento=st.session_state.data.get('tipoAislamiento', 'NA'))
-            st.session_state.data['resMedida_AVSB'] = st.number_input("Resistencia Medida - Alta VS. Baja [GΩ]", key='res_medida_avsb', min_value=0.0, format="%.2f")
-            st.session_state.data['resReferida_AVSB'] = st.session_state.data['resMedida_AVSB']  * obtener_valor_por_temperatura(temperatura_prueba=float(st.session_state.data.get('temperaturaPrueba', 0)), tipo_aislamiento=st.session_state.data.get('tipoAislamiento', 'NA'))
-            st.session_state.data['resMedida_BVST'] = st.number_input("Resistencia Medida - Baja VS. Tierra [GΩ]", key='res_medida_bvst', min_value=0.0, format="%.2f")
-            st.session_state.data['resReferida_BVST'] = st.session_state.data['resMedida_BVST']  * obtener_valor_por_temperatura(temperatura_prueba=float(st.session_state.data.get('temperaturaPrueba', 0)), tipo_aislamiento=st.session_state.data.get('tipoAislamiento', 'NA'))
+            elif st.session_state.data['ubicacionTransformador'] == "Poste":
             
-            st.session_state.data['resEsp_AVST'] = 5 if st.session_state.data['tipoAislamiento'] == "Aceite" else 25
-            st.session_state.data['resEsp_AVSB'] = 5 if st.session_state.data['tipoAislamiento'] == "Aceite" else 25
-            st.session_state.data['resEsp_BVST'] = 1 if st.session_state.data['tipoAislamiento'] == "Aceite" else 5
+                st.session_state.data['resMedida_AVST'] = st.number_input("Resistencia Medida - Alta VS. Tierra [GΩ]", key='res_medida_avst', min_value=0.0, format="%.2f")
+                st.session_state.data['resMedida_AVSB'] = st.number_input("Resistencia Medida - Alta VS. Baja [GΩ]", key='res_medida_avsb', min_value=0.0, format="%.2f")
+                st.session_state.data['resMedida_BVST'] = st.number_input("Resistencia Medida - Baja VS. Tierra [GΩ]", key='res_medida_bvst', min_value=0.0, format="%.2f")
             
-            st.session_state.data['resultado_AVST'] = 'Cumple' if st.session_state.data['resReferida_AVST'] >= st.session_state.data['resEsp_AVST'] else 'No Cumple'
-            st.session_state.data['resultado_AVSB'] = 'Cumple' if st.session_state.data['resReferida_AVSB'] >= st.session_state.data['resEsp_AVSB'] else 'No Cumple'
-            st.session_state.data['resultado_BVST'] = 'Cumple' if st.session_state.data['resReferida_BVST'] >= st.session_state.data['resEsp_BVST'] else 'No Cumple'
+                evaluar_resistencias(st.session_state.data, factor_temperatura)
             
-            st.session_state.data['comentariosPrueba'] = st.text_area("Comentarios de la Prueba", key='comentarios_prueba')
+                st.session_state.data['comentariosPrueba'] = st.text_area("Comentarios de la Prueba", key='comentarios_prueba')
             
-        else:
+            else:
             
-            st.error("Ubicación del Transformador no válida.")
+                st.error("Ubicación del Transformador no válida.")
 
-    cols = st.columns([1,1,1])
-    if cols[0].button("Anterior"):
+        cols = st.columns([1,1,1])
+        anterior = cols[0].form_submit_button("Anterior")
+        siguiente = cols[1].form_submit_button("Siguiente")
+
+    if anterior:
         prev_step()
-    if cols[1].button("Siguiente"):
+    if siguiente:
         next_step()
 
 # Paso 5: Subida de Imágenes y Generación de Word
 elif st.session_state.step == 5:
     
     st.header("Paso 5: Subida de Imágenes de Pruebas y Mapa")
-    datos_Sin_Mayuscula = st.session_state.data.copy()
+    datos_Sin_Mayuscula = st.session_state.data
     
-    datos = convertir_a_mayusculas(datos_Sin_Mayuscula)
+    # Los datos del formulario son planos (str, números, fechas): basta con un nivel
+    datos = {k: v.upper() if isinstance(v, str) else v for k, v in datos_Sin_Mayuscula.items()}
 
 
-    if st.session_state.data['carTrafo_NroFases'] == 3:
+    if st.session_state.data['ubicacionTransformador'] in ("Pedestal", "Poste"):
         
-        if st.session_state.data['ubicacionTransformador'] == "Pedestal":
-            
-
-            # Subida de imágenes por tramo
-            st.subheader("Imágenes de Pruebas del Transformador")
-            
-            key_FichaTecTrafo = "imgFichaTecnicaTrafo"
-            uploaded_FichaTecTrafo = st.file_uploader(f"Imagen de Ficha Técnica del Trafo", type=['png','jpg','jpeg'], key=key_FichaTecTrafo)
-            
-            key_ImagenPrueba1 = "imgPruebaMon1"
-            uploaded_Prueba1 = st.file_uploader(f"Imagen de Prueba #1 (Alta VS Tierra) del Trafo", type=['png','jpg','jpeg'], key=key_ImagenPrueba1)
-            
-            key_ImagenPrueba2 = "imgPruebaMon2"
-            uploaded_Prueba2 = st.file_uploader(f"Imagen de Prueba #2 (Alta VS Baja) del Trafo", type=['png','jpg','jpeg'], key=key_ImagenPrueba2)
-            
-            key_ImagenPrueba3 = "imgPruebaMon3"
-            uploaded_Prueba3 = st.file_uploader(f"Imagen de Prueba #3 (Baja VS Tierra) del Trafo", type=['png','jpg','jpeg'], key=key_ImagenPrueba3)
-            
-            
-            if uploaded_FichaTecTrafo:
-                buf = io.BytesIO(uploaded_FichaTecTrafo.read())
-                buf.seek(0)
-                datos[key_FichaTecTrafo] = InlineImage(st.session_state.doc, buf, Cm(14))
-            else:
-                datos[key_FichaTecTrafo] = None
-                
-                
-            if uploaded_Prueba1:
-                buf = io.BytesIO(uploaded_Prueba1.read())
-                buf.seek(0)
-                datos[key_ImagenPrueba1] = InlineImage(st.session_state.doc, buf, Cm(14))
-            else:
-                datos[key_ImagenPrueba1] = None
-                
-            if uploaded_Prueba2:
-                buf = io.BytesIO(uploaded_Prueba2.read())
-                buf.seek(0)
-                datos[key_ImagenPrueba2] = InlineImage(st.session_state.doc, buf, Cm(14))
-            else:
-                datos[key_ImagenPrueba2] = None
-                
-            if uploaded_Prueba3:
-                buf = io.BytesIO(uploaded_Prueba3.read())
-                buf.seek(0)
-                datos[key_ImagenPrueba3] = InlineImage(st.session_state.doc, buf, Cm(14))
-            else:
-                datos[key_ImagenPrueba3] = None
-                
-            if st.session_state.data['tipoCoordenada'] == "Urbano":
-            
-                if st.session_state.data['latitud'] and st.session_state.data['longitud']:
-                    try:
-                        lat = float(str(datos['latitud']).replace(',', '.'))
-                        lon = float(str(datos['longitud']).replace(',', '.'))
-                        mapa = StaticMap(600, 400)
-                        mapa.add_marker(CircleMarker((lon, lat), 'red', 12))
-                        img_map = mapa.render()
-                        buf_map = io.BytesIO()
-                        img_map.save(buf_map, format='PNG')
-                        buf_map.seek(0)
-                        datos['imgMapsProyecto'] = InlineImage(st.session_state.doc, buf_map, Cm(18))
-                    except Exception as e:
-                        st.error(f"Coordenadas inválidas para el mapa. {e}")
-                else:
-                    st.error("Faltan coordenadas para el mapa.")
-                        
-            else:
-                    
-                if st.session_state.data['latitud'] and st.session_state.data['longitud']:
-                    try:
-                        lat = float(str(st.session_state.data['latitud']).replace(',', '.'))
-                        
-                        lon = float(str(st.session_state.data['longitud']).replace(',', '.'))
-                        
-                        st.warning(f"Prueba de coordenada en modo rural (latitud): {lat}")
-                        st.warning(f"Prueba de coordenada en modo rural (longitud): {lon}")
-                            
-                        png_bytes = get_map_png_bytes(lon, lat, buffer_m=300, zoom=17)
-                            
-                        buf_map = io.BytesIO(png_bytes)
-                        buf_map.seek(0)
-                        datos['imgMapsProyecto'] = InlineImage(st.session_state.doc, buf_map, Cm(18))
-                    except Exception as e:
-                        st.error(f"Coordenadas inválidas para el mapa. {e}")
-                else:
-                    st.error("Faltan coordenadas para el mapa.")
+        # Subida de imágenes por tramo
+        st.subheader("Imágenes de Pruebas del Transformador")
         
-        elif st.session_state.data['ubicacionTransformador'] == "Poste":
-            
-            # Subida de imágenes por tramo
-            st.subheader("Imágenes de Pruebas del Transformador")
-            
-            key_FichaTecTrafo = "imgFichaTecnicaTrafo"
-            uploaded_FichaTecTrafo = st.file_uploader(f"Imagen de Ficha Técnica del Trafo", type=['png','jpg','jpeg'], key=key_FichaTecTrafo)
-            
-            key_ImagenPrueba1 = "imgPruebaMon1"
-            uploaded_Prueba1 = st.file_uploader(f"Imagen de Prueba #1 (Alta VS Tierra) del Trafo", type=['png','jpg','jpeg'], key=key_ImagenPrueba1)
-            
-            key_ImagenPrueba2 = "imgPruebaMon2"
-            uploaded_Prueba2 = st.file_uploader(f"Imagen de Prueba #2 (Alta VS Baja) del Trafo", type=['png','jpg','jpeg'], key=key_ImagenPrueba2)
-            
-            key_ImagenPrueba3 = "imgPruebaMon3"
-            uploaded_Prueba3 = st.file_uploader(f"Imagen de Prueba #3 (Baja VS Tierra) del Trafo", type=['png','jpg','jpeg'], key=key_ImagenPrueba3)
-            
-            
-            if uploaded_FichaTecTrafo:
-                buf = io.BytesIO(uploaded_FichaTecTrafo.read())
-                buf.seek(0)
-                datos[key_FichaTecTrafo] = InlineImage(st.session_state.doc, buf, Cm(14))
-            else:
-                datos[key_FichaTecTrafo] = None
-                
-                
-            if uploaded_Prueba1:
-                buf = io.BytesIO(uploaded_Prueba1.read())
-                buf.seek(0)
-                datos[key_ImagenPrueba1] = InlineImage(st.session_state.doc, buf, Cm(14))
-            else:
-                datos[key_ImagenPrueba1] = None
-                
-            if uploaded_Prueba2:
-                buf = io.BytesIO(uploaded_Prueba2.read())
-                buf.seek(0)
-                datos[key_ImagenPrueba2] = InlineImage(st.session_state.doc, buf, Cm(14))
-            else:
-                datos[key_ImagenPrueba2] = None
-                
-            if uploaded_Prueba3:
-                buf = io.BytesIO(uploaded_Prueba3.read())
-                buf.seek(0)
-                datos[key_ImagenPrueba3] = InlineImage(st.session_state.doc, buf, Cm(14))
-            else:
-                datos[key_ImagenPrueba3] = None
-                
-            if st.session_state.data['tipoCoordenada'] == "Urbano":
-            
-                if st.session_state.data['latitud'] and st.session_state.data['longitud']:
-                    try:
-                        lat = float(str(datos['latitud']).replace(',', '.'))
-                        lon = float(str(datos['longitud']).replace(',', '.'))
-                        mapa = StaticMap(600, 400)
-                        mapa.add_marker(CircleMarker((lon, lat), 'red', 12))
-                        img_map = mapa.render()
-                        buf_map = io.BytesIO()
-                        img_map.save(buf_map, format='PNG')
-                        buf_map.seek(0)
-                        datos['imgMapsProyecto'] = InlineImage(st.session_state.doc, buf_map, Cm(18))
-                    except Exception as e:
-                        st.error(f"Coordenadas inválidas para el mapa. {e}")
-                else:
-                    st.error("Faltan coordenadas para el mapa.")
-                        
-            else:
-                    
-                if st.session_state.data['latitud'] and st.session_state.data['longitud']:
-                    try:
-                        lat = float(str(st.session_state.data['latitud']).replace(',', '.'))
-                        
-                        lon = float(str(st.session_state.data['longitud']).replace(',', '.'))
-                        
-                        st.warning(f"Prueba de coordenada en modo rural (latitud): {lat}")
-                        st.warning(f"Prueba de coordenada en modo rural (longitud): {lon}")
-                            
-                        png_bytes = get_map_png_bytes(lon, lat, buffer_m=300, zoom=17)
-                            
-                        buf_map = io.BytesIO(png_bytes)
-                        buf_map.seek(0)
-                        datos['imgMapsProyecto'] = InlineImage(st.session_state.doc, buf_map, Cm(18))
-                    except Exception as e:
-                        st.error(f"Coordenadas inválidas para el mapa. {e}")
-                else:
-                    st.error("Faltan coordenadas para el mapa.")
+        imagenes_pruebas = obtener_imagenes_pruebas(st.session_state.data)
+        uploads = [st.file_uploader(etiqueta, type=['png','jpg','jpeg'], key=key_imagen) for key_imagen, etiqueta in imagenes_pruebas]
         
-        else:
-            
-            st.error("Ubicación del Transformador no válida.")
-            
-    else:
+        imagenes = reducir_imagenes(uploads, st.session_state.setdefault('imagenesReducidas', {}))
         
-        if st.session_state.data['ubicacionTransformador'] == "Poste":
-            
-            # Subida de imágenes por tramo
-            st.subheader("Imágenes de Pruebas del Transformador")
-            
-            key_FichaTecTrafo = "imgFichaTecnicaTrafo"
-            uploaded_FichaTecTrafo = st.file_uploader(f"Imagen de Ficha Técnica del Trafo", type=['png','jpg','jpeg'], key=key_FichaTecTrafo)
-            
-            key_ImagenPrueba1 = "imgPruebaMon1"
-            uploaded_Prueba1 = st.file_uploader(f"Imagen de Prueba #1 (Alta VS Tierra) del Trafo", type=['png','jpg','jpeg'], key=key_ImagenPrueba1)
-            
-            key_ImagenPrueba2 = "imgPruebaMon2"
-            uploaded_Prueba2 = st.file_uploader(f"Imagen de Prueba #2 (Alta VS Baja) del Trafo", type=['png','jpg','jpeg'], key=key_ImagenPrueba2)
-            
-            key_ImagenPrueba3 = "imgPruebaMon3"
-            uploaded_Prueba3 = st.file_uploader(f"Imagen de Prueba #3 (Baja VS Tierra) del Trafo", type=['png','jpg','jpeg'], key=key_ImagenPrueba3)
-            
-            
-            if uploaded_FichaTecTrafo:
-                buf = io.BytesIO(uploaded_FichaTecTrafo.read())
-                buf.seek(0)
-                datos[key_FichaTecTrafo] = InlineImage(st.session_state.doc, buf, Cm(14))
-            else:
-                datos[key_FichaTecTrafo] = None
-                
-                
-            if uploaded_Prueba1:
-                buf = io.BytesIO(uploaded_Prueba1.read())
-                buf.seek(0)
-                datos[key_ImagenPrueba1] = InlineImage(st.session_state.doc, buf, Cm(14))
-            else:
-                datos[key_ImagenPrueba1] = None
-                
-            if uploaded_Prueba2:
-                buf = io.BytesIO(uploaded_Prueba2.read())
-                buf.seek(0)
-                datos[key_ImagenPrueba2] = InlineImage(st.session_state.doc, buf, Cm(14))
-            else:
-                datos[key_ImagenPrueba2] = None
-                
-            if uploaded_Prueba3:
-                buf = io.BytesIO(uploaded_Prueba3.read())
-                buf.seek(0)
-                datos[key_ImagenPrueba3] = InlineImage(st.session_state.doc, buf, Cm(14))
-            else:
-                datos[key_ImagenPrueba3] = None
-                
-            if st.session_state.data['tipoCoordenada'] == "Urbano":
-            
-                if st.session_state.data['latitud'] and st.session_state.data['longitud']:
-                    try:
-                        lat = float(str(datos['latitud']).replace(',', '.'))
-                        lon = float(str(datos['longitud']).replace(',', '.'))
-                        mapa = StaticMap(600, 400)
-                        mapa.add_marker(CircleMarker((lon, lat), 'red', 12))
-                        img_map = mapa.render()
-                        buf_map = io.BytesIO()
-                        img_map.save(buf_map, format='PNG')
-                        buf_map.seek(0)
-                        datos['imgMapsProyecto'] = InlineImage(st.session_state.doc, buf_map, Cm(18))
-                    except Exception as e:
-                        st.error(f"Coordenadas inválidas para el mapa. {e}")
-                else:
-                    st.error("Faltan coordenadas para el mapa.")
-                        
-            else:
-                    
-                if st.session_state.data['latitud'] and st.session_state.data['longitud']:
-                    try:
-                        lat = float(str(st.session_state.data['latitud']).replace(',', '.'))
-                        
-                        lon = float(str(st.session_state.data['longitud']).replace(',', '.'))
-                        
-                        st.warning(f"Prueba de coordenada en modo rural (latitud): {lat}")
-                        st.warning(f"Prueba de coordenada en modo rural (longitud): {lon}")
-                            
-                        png_bytes = get_map_png_bytes(lon, lat, buffer_m=300, zoom=17)
-                            
-                        buf_map = io.BytesIO(png_bytes)
-                        buf_map.seek(0)
-                        datos['imgMapsProyecto'] = InlineImage(st.session_state.doc, buf_map, Cm(18))
-                    except Exception as e:
-                        st.error(f"Coordenadas inválidas para el mapa. {e}")
-                else:
-                    st.error("Faltan coordenadas para el mapa.")
-                    
-        elif st.session_state.data['ubicacionTransformador'] == "Pedestal":
+        for (key_imagen, _), imagen in zip(imagenes_pruebas, imagenes):
+            datos[key_imagen] = crear_imagen_word(st.session_state.doc, imagen)
         
-            # Subida de imágenes por tramo
-            st.subheader("Imágenes de Pruebas del Transformador")
-            
-            key_FichaTecTrafo = "imgFichaTecnicaTrafo"
-            uploaded_FichaTecTrafo = st.file_uploader(f"Imagen de Ficha Técnica del Trafo", type=['png','jpg','jpeg'], key=key_FichaTecTrafo)
-            
-            key_ImagenPrueba1 = "imgPruebaMon1"
-            uploaded_Prueba1 = st.file_uploader(f"Imagen de Prueba #1 (Alta VS Baja) del Trafo", type=['png','jpg','jpeg'], key=key_ImagenPrueba1)
-            
-            key_ImagenPrueba2 = "imgPruebaMon2"
-            uploaded_Prueba2 = st.file_uploader(f"Imagen de Prueba #2 (Baja VS Tierra) del Trafo", type=['png','jpg','jpeg'], key=key_ImagenPrueba2)
-            
-            
-            if uploaded_FichaTecTrafo:
-                buf = io.BytesIO(uploaded_FichaTecTrafo.read())
-                buf.seek(0)
-                datos[key_FichaTecTrafo] = InlineImage(st.session_state.doc, buf, Cm(14))
-            else:
-                datos[key_FichaTecTrafo] = None
-                
-                
-            if uploaded_Prueba1:
-                buf = io.BytesIO(uploaded_Prueba1.read())
-                buf.seek(0)
-                datos[key_ImagenPrueba1] = InlineImage(st.session_state.doc, buf, Cm(14))
-            else:
-                datos[key_ImagenPrueba1] = None
-                
-            if uploaded_Prueba2:
-                buf = io.BytesIO(uploaded_Prueba2.read())
-                buf.seek(0)
-                datos[key_ImagenPrueba2] = InlineImage(st.session_state.doc, buf, Cm(14))
-            else:
-                datos[key_ImagenPrueba2] = None
-                
-            if st.session_state.data['tipoCoordenada'] == "Urbano":
-            
-                if st.session_state.data['latitud'] and st.session_state.data['longitud']:
-                    try:
-                        lat = float(str(datos['latitud']).replace(',', '.'))
-                        lon = float(str(datos['longitud']).replace(',', '.'))
-                        mapa = StaticMap(600, 400)
-                        mapa.add_marker(CircleMarker((lon, lat), 'red', 12))
-                        img_map = mapa.render()
-                        buf_map = io.BytesIO()
-                        img_map.save(buf_map, format='PNG')
-                        buf_map.seek(0)
-                        datos['imgMapsProyecto'] = InlineImage(st.session_state.doc, buf_map, Cm(18))
-                    except Exception as e:
-                        st.error(f"Coordenadas inválidas para el mapa. {e}")
-                else:
-                    st.error("Faltan coordenadas para el mapa.")
-                        
-            else:
-                    
-                if st.session_state.data['latitud'] and st.session_state.data['longitud']:
-                    try:
-                        lat = float(str(st.session_state.data['latitud']).replace(',', '.'))
-                        
-                        lon = float(str(st.session_state.data['longitud']).replace(',', '.'))
-                        
-                        st.warning(f"Prueba de coordenada en modo rural (latitud): {lat}")
-                        st.warning(f"Prueba de coordenada en modo rural (longitud): {lon}")
-                            
-                        png_bytes = get_map_png_bytes(lon, lat, buffer_m=300, zoom=17)
-                            
-                        buf_map = io.BytesIO(png_bytes)
-                        buf_map.seek(0)
-                        datos['imgMapsProyecto'] = InlineImage(st.session_state.doc, buf_map, Cm(18))
-                    except Exception as e:
-                        st.error(f"Coordenadas inválidas para el mapa. {e}")
-                else:
-                    st.error("Faltan coordenadas para el mapa.")
-    
-        else:
-            
-            st.error("Ubicación del Transformador no válida.")
+        agregar_mapa_proyecto(st.session_state.data, datos, st.session_state.doc)
+        
+    else:
+        
+        st.error("Ubicación del Transformador no válida.")
 
 
     if st.button("Generar Word"):